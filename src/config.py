@@ -1,10 +1,11 @@
-import platform
+import functools
 
 import numpy as np
-from matplotlib.colors import LinearSegmentedColormap
 
 
 class Result(object):
+    __slots__ = ('result_dict', 'obj_value', 'success', 'minimal_obj_value', 'label')
+
     def __init__(
             self, result_dict: dict, obj_value: float, success: bool, minimal_obj_value: float, label: dict):
         self.result_dict = result_dict
@@ -13,84 +14,211 @@ class Result(object):
         self.minimal_obj_value = minimal_obj_value
         self.label = label
 
+    @classmethod
+    def stack(cls, results):
+        flux_name_list = []
+        for result in results:
+            if result.result_dict:
+                flux_name_list = list(result.result_dict)
+                break
+        result_num = len(results)
+        return {
+            flux_name: np.fromiter(
+                (result.result_dict.get(flux_name, np.nan) for result in results),
+                dtype=np.float64, count=result_num)
+            for flux_name in flux_name_list}
+
+    def __getstate__(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __setstate__(self, state):
+        # Pickles made before __slots__ was declared carry a plain __dict__ as state.
+        if isinstance(state, tuple):
+            state = dict(state[0] or {}, **state[1])
+        for key in self.__slots__:
+            setattr(self, key, state[key])
+
     def __repr__(self):
         return "Result: {}\nObjective value: {}\nSuccess: {}\nMinimal objective value: {}".format(
             self.result_dict, self.obj_value, self.success, self.minimal_obj_value)
 
 
+_LINSPACE_CACHE = {}
+
+
 class FreeVariable(object):
+    __slots__ = ('flux_name', 'n_intervals', 'n_points', 'range', 'display_interv')
+
     def __init__(self, name, total_num, var_range, display_interv):
         self.flux_name = name
-        self.total_num = total_num + 1
+        self.n_intervals = total_num
+        self.n_points = total_num + 1
         self.range = var_range
         self.display_interv = display_interv
-        self.value_array = np.linspace(*self.range, self.total_num)
-        self.tick_in_range = np.arange(0, self.total_num, self.display_interv, dtype='int')
-        self.tick_labels = np.around(self.value_array[self.tick_in_range])
+
+    def __getstate__(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            state = dict(state[0] or {}, **state[1])
+        if 'n_points' not in state:
+            # Old pickles store the number of points as total_num, plus the derived arrays.
+            state = dict(state, n_points=state['total_num'], n_intervals=state['total_num'] - 1)
+        for key in self.__slots__:
+            setattr(self, key, state[key])
+
+    @property
+    def value_array(self):
+        key = (tuple(self.range), self.n_points)
+        try:
+            return _LINSPACE_CACHE[key]
+        except KeyError:
+            value_array = np.linspace(self.range[0], self.range[1], self.n_points, endpoint=True)
+            value_array.setflags(write=False)
+            _LINSPACE_CACHE[key] = value_array
+            return value_array
+
+    @property
+    def tick_in_range(self):
+        return np.arange(0, self.n_points, self.display_interv, dtype=np.intp)
+
+    @property
+    def tick_labels(self):
+        return np.rint(self.value_array[::self.display_interv]).astype(np.int64)
 
     def __iter__(self):
         return self.value_array.__iter__()
 
 
-def rgba_to_rgb(raw_rgb, alpha, background):
-    return raw_rgb * alpha + background * (1 - alpha)
-
-
 def empty_vector(n):
-    a = np.empty(n)
-    a.fill(np.nan)
-    return a
+    return np.full(n, np.nan, dtype=np.float64)
 
 
 def bound_pair_generator(min_flux_value, max_flux_value, flux_list, special_bound_dict=None):
-    if special_bound_dict is None:
-        bound_pair_list = ([min_flux_value] * len(flux_list), [max_flux_value] * len(flux_list))
-    else:
-        bound_pair_list = ([], [])
-        for flux_name in flux_list:
-            if flux_name in special_bound_dict:
-                special_min, special_max = special_bound_dict[flux_name]
-                bound_pair_list[0].append(special_min)
-                bound_pair_list[1].append(special_max)
-            else:
-                bound_pair_list[0].append(min_flux_value)
-                bound_pair_list[1].append(max_flux_value)
-    return bound_pair_list
+    flux_num = len(flux_list)
+    min_bound_array = np.full(flux_num, min_flux_value, dtype=np.float64)
+    max_bound_array = np.full(flux_num, max_flux_value, dtype=np.float64)
+    if special_bound_dict:
+        special_index_list = [
+            index for index, flux_name in enumerate(flux_list) if flux_name in special_bound_dict]
+        special_bound_array = np.array(
+            [special_bound_dict[flux_list[index]] for index in special_index_list], dtype=np.float64).reshape([-1, 2])
+        min_bound_array[special_index_list] = special_bound_array[:, 0]
+        max_bound_array[special_index_list] = special_bound_array[:, 1]
+    return min_bound_array, max_bound_array
+
+
+def _const(array):
+    array = np.asarray(array, dtype=np.float64)
+    array.setflags(write=False)
+    return array
+
+
+# All palette colors live in one array; the named colors below are read-only row views of it.
+_PALETTE = np.array([
+    [255, 255, 255],
+    [21, 113, 177],
+    [251, 138, 68],
+    [112, 48, 160],
+    [221, 241, 255]], dtype=np.float64) / 255
+_PALETTE.setflags(write=False)
+
+WHITE = _PALETTE[0]
+BLUE = _PALETTE[1]
+ORANGE = _PALETTE[2]
+PURPLE = _PALETTE[3]
+LIGHT_BLUE = _PALETTE[4]
+
+ALPHA_VALUE = 0.3
+ALPHA_FOR_BAR_PLOT = ALPHA_VALUE + 0.1
+ALPHA_FOR_HEATMAP = ALPHA_VALUE + 0.2
+
+# Blue, white and orange blended with ALPHA_FOR_HEATMAP over a white background.
+HEATMAP_COLOR_LIST = _const(
+    np.vstack([BLUE, WHITE, ORANGE]) * ALPHA_FOR_HEATMAP + WHITE * (1 - ALPHA_FOR_HEATMAP))
+
+
+@functools.lru_cache(maxsize=1)
+def blue_orange_cmap():
+    import matplotlib
+    from matplotlib.colors import LinearSegmentedColormap
+
+    cmap = LinearSegmentedColormap.from_list('BlOr', HEATMAP_COLOR_LIST, N=200)
+    # Registered so that plots can also refer to it by name, e.g. cmap='BlOr'. Name lookups get a copy from the
+    # registry; only blue_orange_cmap() itself hands out the one cached instance.
+    try:
+        matplotlib.colormaps.register(cmap, name='BlOr', force=True)
+    except AttributeError:
+        matplotlib.cm.register_cmap(name='BlOr', cmap=cmap)
+    return cmap
+
+
+class _LazyCmap(object):
+    def __init__(self, factory):
+        self.factory = factory
+
+    def __get__(self, instance, owner):
+        return self.factory()
 
 
 class Color(object):
-    white = np.array([1, 1, 1])
-    blue = np.array([21, 113, 177]) / 255
-    orange = np.array([251, 138, 68]) / 255
-    purple = np.array([112, 48, 160]) / 255
-    light_blue = np.array([221, 241, 255]) / 255
+    white = WHITE
+    blue = BLUE
+    orange = ORANGE
+    purple = PURPLE
+    light_blue = LIGHT_BLUE
+
+    alpha_value = ALPHA_VALUE
+    alpha_for_bar_plot = ALPHA_FOR_BAR_PLOT
+    alpha_for_heatmap = ALPHA_FOR_HEATMAP
+
+    color_list = HEATMAP_COLOR_LIST
+
+    blue_orange_cmap = _LazyCmap(blue_orange_cmap)
+
+
+PLASMA_MARKER = 'Sr'
+BRAIN_MARKER = 'Br'
+HEART_MARKER = 'Ht'
+MUSCLE_MARKER = 'SkM'
+KIDNEY_MARKER = 'Kd'
+LUNG_MARKER = 'Lg'
+PANCREAS_MARKER = 'Pc'
+INTESTINE_MARKER = 'SI'
+SPLEEN_MARKER = 'Sp'
+LIVER_MARKER = 'Lv'
+
+TARGET_LABEL = 'target'
+C13_RATIO = 0.01109
+EPS_FOR_LOG = np.float64(1e-10)
+EPS_OF_MID = 1e-5
+
+DATA_DIRECT = "data"
+OUTPUT_DIRECT = "new_models"
+DEFAULT_TISSUE_NAME = ''
 
-    alpha_value = 0.3
-    alpha_for_bar_plot = alpha_value + 0.1
-    alpha_for_heatmap = alpha_value + 0.2
 
-    color_list = [
-        rgba_to_rgb(blue, alpha_for_heatmap, white), white,
-        rgba_to_rgb(orange, alpha_for_heatmap, white)]
-    blue_orange_cmap = LinearSegmentedColormap.from_list('BlOr', color_list, N=200)
+def safe_log(x, out=None):
+    return np.log(np.maximum(x, EPS_FOR_LOG, out=out), out=out)
 
 
 class Constants(object):
-    plasma_marker = 'Sr'
-    brain_marker = 'Br'
-    heart_marker = 'Ht'
-    muscle_marker = 'SkM'
-    kidney_marker = 'Kd'
-    lung_marker = 'Lg'
-    pancreas_marker = 'Pc'
-    intestine_marker = 'SI'
-    spleen_marker = 'Sp'
-    liver_marker = 'Lv'
-    target_label = 'target'
-    c13_ratio = 0.01109
-    eps_for_log = 1e-10
-    eps_of_mid = 1e-5
-
-    data_direct = "data"
-    output_direct = "new_models"
-    default_tissue_name = ''
+    plasma_marker = PLASMA_MARKER
+    brain_marker = BRAIN_MARKER
+    heart_marker = HEART_MARKER
+    muscle_marker = MUSCLE_MARKER
+    kidney_marker = KIDNEY_MARKER
+    lung_marker = LUNG_MARKER
+    pancreas_marker = PANCREAS_MARKER
+    intestine_marker = INTESTINE_MARKER
+    spleen_marker = SPLEEN_MARKER
+    liver_marker = LIVER_MARKER
+    target_label = TARGET_LABEL
+    c13_ratio = C13_RATIO
+    eps_for_log = EPS_FOR_LOG
+    eps_of_mid = EPS_OF_MID
+
+    data_direct = DATA_DIRECT
+    output_direct = OUTPUT_DIRECT
+    default_tissue_name = DEFAULT_TISSUE_NAME
@@ -1,9 +1,11 @@
+import functools
 import warnings
 
 import xlrd
 import numpy as np
 
 kTissueList = ['Sr', 'AT', 'Br', 'Ht', 'Kd', 'Lg', 'Lv', 'Pc', 'SI', 'SkM', 'Sp']
+kTissueSet = frozenset(kTissueList)
 
 
 # DataCollect:
@@ -33,6 +35,12 @@ class OldDataCollect:
         self.tissue_mids = tissue_mid_dict
 
 
+# Workbooks are only read, so a parsed workbook is shared by every loader call in this process.
+@functools.lru_cache(maxsize=None)
+def open_workbook(file_path):
+    return xlrd.open_workbook(file_path)
+
+
 def data_loader(file_path, sheet_name):
     def load_one_part(metabolite_name_list, carbon_num_list, start_row_list):
         part_mids = {}
@@ -45,7 +53,7 @@ def data_loader(file_path, sheet_name):
             part_mids[metabolite_name] = np.array(mid_list)
         return part_mids
 
-    data_book = xlrd.open_workbook(str(file_path))
+    data_book = open_workbook(str(file_path))
     data_sheet = data_book.sheet_by_name(sheet_name)
     experiment_label_list = ["glucose", "lactate"]
     experiment_col_list = [2, 3]
@@ -88,7 +96,7 @@ def metabolite_name_strip(raw_metabolite_name):
 
 
 def data_parser(file_path, experiment_name_prefix, label_list):
-    data_book = xlrd.open_workbook(str(file_path))
+    data_book = open_workbook(str(file_path))
     mid_data_dict = {}
     for label_name in label_list:
         current_label_data_dict = {}
@@ -116,7 +124,7 @@ def data_parser(file_path, experiment_name_prefix, label_list):
                     new_sample = True
                 sample_num = sample_count_dict[sample_id]
                 mouse_id, tissue = sample_id.split('_')
-                if tissue not in kTissueList:
+                if tissue not in kTissueSet:
                     raise ValueError("Tissue not recognized! Col: {} Tissue: {}".format(current_col, tissue))
                 if new_sample:
                     this_tissue_dict = {}
@@ -331,6 +331,7 @@ def parameter_sensitivity_model1(
         'optimization_repeat_time': optimization_repeat_time,
         'f1_free_flux': f1_free_flux, 'g2_free_flux': g2_free_flux, 'iter_length': total_iter_num,
         'obj_tolerance': obj_tolerance, 'output_direct': output_direct, 'model_name': model_name,
+        'resumable': False,
     }
     model_parameter_dict_list = model_parameter_generator_constructor(
         model_mid_data_dict, mid_sigma, flux_sigma)
@@ -421,7 +422,7 @@ def dynamic_range_model345(
         'obj_tolerance': obj_tolerance, 'output_direct': output_direct,
         'free_fluxes_name_list': free_fluxes_name_list,
         'iter_length': total_iter_num, 'fitted': fitted, 'model_name': model_name,
-        'parallel_num': parallel_num,
+        'parallel_num': parallel_num, 'resumable': not sample,
 
         'ternary_sigma': ternary_sigma, 'ternary_resolution': ternary_resolution
     }
@@ -484,7 +485,7 @@ def all_tissue_model3(
         'obj_tolerance': obj_tolerance, 'output_direct': output_direct,
         'free_fluxes_name_list': free_fluxes_name_list,
         'iter_length': total_iter_length, 'model_name': model_name,
-        'parallel_num': parallel_num,
+        'parallel_num': parallel_num, 'resumable': False,
 
         'ternary_sigma': ternary_sigma, 'ternary_resolution': ternary_resolution
     }
@@ -1134,13 +1135,6 @@ def func_parallel_wrap(func_tuple):
     func(**kwargs)
 
 
-def append_flux_distribution(result_dict, feasible_flux_distribution_dict):
-    for flux_name, flux_value in result_dict.items():
-        if flux_name not in feasible_flux_distribution_dict:
-            feasible_flux_distribution_dict[flux_name] = []
-        feasible_flux_distribution_dict[flux_name].append(flux_value)
-
-
 def mid_prediction_preparation(tissue_name_list, mid_constraint_list_dict):
     target_vector_dict = {tissue_name: {} for tissue_name in tissue_name_list}
     mid_size_dict = {}
@@ -1181,7 +1175,7 @@ def final_processing_dynamic_range_model12(
     if not os.path.isdir(output_direct):
         os.mkdir(output_direct)
 
-    valid_matrix = np.zeros([f1_free_flux.total_num, g2_free_flux.total_num])
+    valid_matrix = np.zeros([f1_free_flux.n_points, g2_free_flux.n_points])
     well_fitted_count_dict = {tissue_name: 0 for tissue_name in tissue_name_list}
 
     valid_matrix_dict = {
@@ -1191,7 +1185,7 @@ def final_processing_dynamic_range_model12(
 
     glucose_contri_matrix_tissue_dict = {tissue_name: {} for tissue_name in tissue_name_list}
     well_fit_glucose_contri_tissue_dict = {tissue_name: {} for tissue_name in tissue_name_list}
-    feasible_flux_distribution_tissue_dict = {tissue_name: {} for tissue_name in tissue_name_list}
+    well_fitted_result_tissue_dict = {tissue_name: [] for tissue_name in tissue_name_list}
     filtered_obj_list_dict = {tissue_name: [] for tissue_name in tissue_name_list}
     predicted_mid_collection_dict = {tissue_name: {} for tissue_name in tissue_name_list}
 
@@ -1206,7 +1200,6 @@ def final_processing_dynamic_range_model12(
         objective_function_matrix = objective_function_matrix_dict[tissue_name]
         glucose_contri_matrix_dict = glucose_contri_matrix_tissue_dict[tissue_name]
         well_fit_glucose_contri_dict = well_fit_glucose_contri_tissue_dict[tissue_name]
-        feasible_flux_distribution_dict = feasible_flux_distribution_tissue_dict[tissue_name]
 
         matrix_loc = solver_result.label['matrix_loc']
         contribution_dict = processed_dict['contribution_dict']
@@ -1216,7 +1209,7 @@ def final_processing_dynamic_range_model12(
         objective_function_matrix[matrix_loc] = obj_diff
         result_dict = solver_result.result_dict
         if valid and obj_diff < obj_tolerance:
-            append_flux_distribution(result_dict, feasible_flux_distribution_dict)
+            well_fitted_result_tissue_dict[tissue_name].append(solver_result)
             one_case_mid_prediction(
                 result_dict, mid_constraint_list_dict[tissue_name], mid_size_dict,
                 predicted_mid_collection_dict[tissue_name])
@@ -1250,8 +1243,8 @@ def final_processing_dynamic_range_model12(
         if all_tissue and sink_label in well_fit_glucose_contri_dict:
             sink_tissue_contribution_dict[tissue_name] = well_fit_glucose_contri_dict[sink_label]
         feasible_flux_distribution_dict = {
-            flux_name: np.array(flux_list)
-            for flux_name, flux_list in feasible_flux_distribution_tissue_dict[tissue_name].items()
+            flux_name: flux_array
+            for flux_name, flux_array in config.Result.stack(well_fitted_result_tissue_dict[tissue_name]).items()
             if flux_name not in raw_constant_flux_dict}
 
         # filtered_obj_function_matrix = objective_function_matrix.copy()
@@ -1351,7 +1344,7 @@ def final_processing_dynamic_range_model345(
     invalid_point_list_dict = {tissue_name: [] for tissue_name in tissue_name_list}
     objective_value_list_dict = {tissue_name: [] for tissue_name in tissue_name_list}
     well_fit_contri_tissue_dict = {tissue_name: {} for tissue_name in tissue_name_list}
-    feasible_flux_distribution_tissue_dict = {tissue_name: {} for tissue_name in tissue_name_list}
+    well_fitted_result_tissue_dict = {tissue_name: [] for tissue_name in tissue_name_list}
     predicted_mid_collection_dict = {tissue_name: {} for tissue_name in tissue_name_list}
 
     target_vector_dict, mid_size_dict = mid_prediction_preparation(tissue_name_list, mid_constraint_list_dict)
@@ -1365,7 +1358,6 @@ def final_processing_dynamic_range_model345(
         invalid_point_list = invalid_point_list_dict[tissue_name]
         objective_value_list = objective_value_list_dict[tissue_name]
         well_fit_contri_list_dict = well_fit_contri_tissue_dict[tissue_name]
-        feasible_flux_distribution_dict = feasible_flux_distribution_tissue_dict[tissue_name]
 
         constant_fluxes_dict = var_parameter['constant_flux_dict']
         obj_diff = processed_dict['obj_diff']
@@ -1378,7 +1370,7 @@ def final_processing_dynamic_range_model345(
             if obj_diff < obj_tolerance:
                 result_dict = solver_result.result_dict
                 well_fitted_count_dict[tissue_name] += 1
-                append_flux_distribution(result_dict, feasible_flux_distribution_dict)
+                well_fitted_result_tissue_dict[tissue_name].append(solver_result)
                 one_case_mid_prediction(
                     result_dict, mid_constraint_list_dict[tissue_name], mid_size_dict,
                     predicted_mid_collection_dict[tissue_name])
@@ -1406,8 +1398,8 @@ def final_processing_dynamic_range_model345(
             contribution_type: np.array(contri_list)
             for contribution_type, contri_list in well_fit_contri_tissue_dict[tissue_name].items()}
         feasible_flux_distribution_dict = {
-            flux_name: np.array(flux_list)
-            for flux_name, flux_list in feasible_flux_distribution_tissue_dict[tissue_name].items()
+            flux_name: flux_array
+            for flux_name, flux_array in config.Result.stack(well_fitted_result_tissue_dict[tissue_name]).items()
             if flux_name not in raw_constant_flux_dict}
 
         obj_diff_array = np.array(objective_value_list)
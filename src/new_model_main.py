@@ -1,35 +1,50 @@
 import argparse
 import gzip
+import hashlib
 import itertools as it
 import multiprocessing as mp
 import os
 import pickle
+import sqlite3
+import threading
 from functools import partial
 
+# Each pool worker solves one case at a time, so BLAS threads inside the workers only oversubscribe the cores.
+# This has to happen before numpy is first imported.
+for _thread_num_variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+    os.environ.setdefault(_thread_num_variable, '1')
+
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy.interpolate
+import scipy.ndimage
 import scipy.optimize
-import scipy.signal
-import ternary
+import scipy.sparse
 import tqdm
-from scipy.special import comb as scipy_comb
-from ternary.helpers import simplex_iterator
+from scipy.special import gammaln
 
 from src import model_parameter_functions, config
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 constant_set = config.Constants()
 color_set = config.Color()
 
 
 def natural_dist(_c13_ratio, carbon_num):
-    c12_ratio = 1 - _c13_ratio
-    total_num = carbon_num + 1
-    output = []
-    for index in range(total_num):
-        output.append(
-            scipy_comb(carbon_num, index) * _c13_ratio ** index * c12_ratio ** (carbon_num - index))
-    return np.array(output)
+    index_array = np.arange(carbon_num + 1)
+    log_comb_array = gammaln(carbon_num + 1) - gammaln(index_array + 1) - gammaln(carbon_num - index_array + 1)
+    log_dist_array = (
+        log_comb_array + index_array * np.log(_c13_ratio) + (carbon_num - index_array) * np.log1p(-_c13_ratio))
+    return np.exp(log_dist_array)
 
 
 def split_equal_dist(source_mid, target_carbon_num):
@@ -37,12 +52,10 @@ def split_equal_dist(source_mid, target_carbon_num):
     if carbon_num % 2 != 0:
         raise ValueError("Length is not multiply of 2 !!!")
     new_carbon_num = target_carbon_num
-    final_output_vector = np.zeros(new_carbon_num + 1)
+    average_ratio = (1 - source_mid[0] - source_mid[-1]) / (new_carbon_num - 1)
+    final_output_vector = np.full(new_carbon_num + 1, average_ratio, dtype=np.float64)
     final_output_vector[0] = source_mid[0]
     final_output_vector[-1] = source_mid[-1]
-    average_ratio = (1 - final_output_vector[0] - final_output_vector[-1]) / (new_carbon_num - 1)
-    for i in range(1, new_carbon_num):
-        final_output_vector[i] = average_ratio
 
     # _c12_ratio = np.power(source_mid[0], (1 / carbon_num))
     # _c13_ratio = 1 - _c12_ratio
@@ -51,6 +64,14 @@ def split_equal_dist(source_mid, target_carbon_num):
     return final_output_vector
 
 
+def self_convolve_rows(data_matrix):
+    row_num, column_num = data_matrix.shape
+    result_matrix = np.zeros((row_num, 2 * column_num - 1))
+    for index in range(column_num):
+        result_matrix[:, index:index + column_num] += data_matrix[:, index:index + 1] * data_matrix
+    return result_matrix
+
+
 def collect_all_data(
         data_dict, _metabolite_name, _label_list, _tissue, _mouse_id_list=None, convolve=False,
         split=0, mean=True):
@@ -61,12 +82,13 @@ def collect_all_data(
         for mouse_label in _mouse_id_list:
             data_for_mouse = data_dict[label][mouse_label]
             data_vector = data_for_mouse[_tissue][_metabolite_name]
-            if convolve:
-                data_vector = np.convolve(data_vector, data_vector)
-            elif split != 0:
+            if not convolve and split != 0:
                 data_vector = split_equal_dist(data_vector, split)
             matrix.append(data_vector)
-    result_matrix = np.array(matrix).transpose()
+    data_matrix = np.array(matrix, dtype=np.float64)
+    if convolve:
+        data_matrix = self_convolve_rows(data_matrix)
+    result_matrix = data_matrix.transpose()
     if mean:
         return result_matrix.mean(axis=1)
     else:
@@ -74,150 +96,244 @@ def collect_all_data(
 
 
 def flux_balance_constraint_constructor(balance_list, complete_flux_dict):
-    flux_balance_multiply_array_list = []
-    flux_balance_constant_vector_list = []
-    for balance_dict in balance_list:
-        new_balance_array = np.zeros(len(complete_flux_dict))
+    balance_num = len(balance_list)
+    row_index_list = []
+    column_index_list = []
+    value_list = []
+    for row_index, balance_dict in enumerate(balance_list):
         flux_name_list = balance_dict['input'] + balance_dict['output']
-        value_list = [-1 for _ in balance_dict['input']] + [1 for _ in balance_dict['output']]
-        for flux_name, value in zip(flux_name_list, value_list):
-            flux_index = complete_flux_dict[flux_name]
-            new_balance_array[flux_index] = value
-        flux_balance_multiply_array_list.append(new_balance_array)
-        flux_balance_constant_vector_list.append(0)
-    flux_balance_matrix = np.array(flux_balance_multiply_array_list)
-    flux_balance_constant_vector = np.array(flux_balance_constant_vector_list)
+        row_index_list.extend([row_index] * len(flux_name_list))
+        column_index_list.extend(complete_flux_dict[flux_name] for flux_name in flux_name_list)
+        value_list.extend([-1] * len(balance_dict['input']) + [1] * len(balance_dict['output']))
+    flux_balance_matrix = np.zeros((balance_num, len(complete_flux_dict)))
+    flux_balance_matrix[row_index_list, column_index_list] = value_list
+    flux_balance_constant_vector = np.zeros(balance_num)
     return flux_balance_matrix, flux_balance_constant_vector
 
 
 def mid_constraint_constructor(mid_constraint_list, complete_flux_dict):
     complete_var_num = len(complete_flux_dict)
-    substrate_mid_matrix_list = []
-    flux_sum_matrix_list = []
-    target_mid_vector_list = []
-    for mid_constraint_dict in mid_constraint_list:
-        target_mid_vector = mid_constraint_dict[constant_set.target_label]
-        vector_dim = len(target_mid_vector)
-        new_substrate_mid_matrix_list = [np.zeros(complete_var_num) for _ in range(vector_dim)]
-        new_flux_sum_matrix_list = [np.zeros(complete_var_num) for _ in range(vector_dim)]
-        target_mid_vector_list.append(target_mid_vector)
-        for flux_name, vector in mid_constraint_dict.items():
-            if flux_name == constant_set.target_label:
-                continue
-            flux_index = complete_flux_dict[flux_name]
-            for index, vector_value in enumerate(vector):
-                new_substrate_mid_matrix_list[index][flux_index] = vector_value
-                new_flux_sum_matrix_list[index][flux_index] = 1
-        substrate_mid_matrix_list.extend(new_substrate_mid_matrix_list)
-        flux_sum_matrix_list.extend(new_flux_sum_matrix_list)
-    substrate_mid_matrix = np.array(substrate_mid_matrix_list)
-    flux_sum_matrix = np.array(flux_sum_matrix_list)
-    target_mid_vector = np.hstack(target_mid_vector_list) + constant_set.eps_for_log
-    optimal_obj_value = -np.sum(target_mid_vector * np.log(target_mid_vector))
+    target_mid_vector_list = [
+        mid_constraint_dict[constant_set.target_label] for mid_constraint_dict in mid_constraint_list]
+    total_row_num = sum(len(target_mid_vector) for target_mid_vector in target_mid_vector_list)
+    substrate_mid_matrix = np.zeros((total_row_num, complete_var_num))
+    flux_sum_matrix = np.zeros((total_row_num, complete_var_num))
+    target_mid_vector = np.empty(total_row_num)
+    row_start = 0
+    for mid_constraint_dict, current_target_mid_vector in zip(mid_constraint_list, target_mid_vector_list):
+        row_end = row_start + len(current_target_mid_vector)
+        flux_name_list = [
+            flux_name for flux_name in mid_constraint_dict.keys() if flux_name != constant_set.target_label]
+        flux_index_array = np.fromiter(
+            (complete_flux_dict[flux_name] for flux_name in flux_name_list), dtype=np.intp,
+            count=len(flux_name_list))
+        substrate_mid_array = np.stack([mid_constraint_dict[flux_name] for flux_name in flux_name_list])
+        substrate_mid_matrix[row_start:row_end, flux_index_array] = substrate_mid_array.T
+        flux_sum_matrix[row_start:row_end, flux_index_array] = 1
+        target_mid_vector[row_start:row_end] = current_target_mid_vector
+        row_start = row_end
+    target_mid_vector += constant_set.eps_for_log
+    optimal_obj_value = -float(np.dot(target_mid_vector, np.log(target_mid_vector)))
     return substrate_mid_matrix, flux_sum_matrix, target_mid_vector, optimal_obj_value
 
 
 def constant_flux_constraint_constructor(constant_flux_dict, complete_flux_dict):
-    constant_flux_multiply_array_list = []
-    constant_flux_constant_vector_list = []
-    for constant_flux, value in constant_flux_dict.items():
-        new_balance_array = np.zeros(len(complete_flux_dict))
-        flux_index = complete_flux_dict[constant_flux]
-        new_balance_array[flux_index] = 1
-        constant_flux_multiply_array_list.append(new_balance_array)
-        constant_flux_constant_vector_list.append(-value)
-    constant_flux_matrix = np.array(constant_flux_multiply_array_list)
-    constant_constant_vector = np.array(constant_flux_constant_vector_list)
+    constant_flux_num = len(constant_flux_dict)
+    constant_flux_matrix = np.zeros((constant_flux_num, len(complete_flux_dict)))
+    constant_constant_vector = np.empty(constant_flux_num)
+    for row_index, (constant_flux, value) in enumerate(constant_flux_dict.items()):
+        constant_flux_matrix[row_index, complete_flux_dict[constant_flux]] = 1
+        constant_constant_vector[row_index] = -value
     return constant_flux_matrix, constant_constant_vector
 
 
+def cross_entropy_kernel(substrate_mid_matrix, flux_sum_matrix, target_mid_vector, eps_for_log, complete_vector):
+    row_num, column_num = substrate_mid_matrix.shape
+    cross_entropy = 0.0
+    for row_index in range(row_num):
+        substrate_mid_sum = 0.0
+        flux_sum = 0.0
+        for column_index in range(column_num):
+            substrate_mid_sum += substrate_mid_matrix[row_index, column_index] * complete_vector[column_index]
+            flux_sum += flux_sum_matrix[row_index, column_index] * complete_vector[column_index]
+        predicted_mid_value = max(substrate_mid_sum / flux_sum, eps_for_log)
+        cross_entropy -= target_mid_vector[row_index] * np.log(predicted_mid_value)
+    return cross_entropy
+
+
+def cross_entropy_jacobi_kernel(substrate_mid_matrix, flux_sum_matrix, target_mid_vector, complete_vector):
+    row_num, column_num = substrate_mid_matrix.shape
+    jacobian_vector = np.zeros(column_num)
+    for row_index in range(row_num):
+        substrate_mid_sum = 0.0
+        flux_sum = 0.0
+        for column_index in range(column_num):
+            substrate_mid_sum += substrate_mid_matrix[row_index, column_index] * complete_vector[column_index]
+            flux_sum += flux_sum_matrix[row_index, column_index] * complete_vector[column_index]
+        substrate_mid_weight = target_mid_vector[row_index] / substrate_mid_sum
+        flux_sum_weight = target_mid_vector[row_index] / flux_sum
+        for column_index in range(column_num):
+            jacobian_vector[column_index] += (
+                flux_sum_weight * flux_sum_matrix[row_index, column_index] -
+                substrate_mid_weight * substrate_mid_matrix[row_index, column_index])
+    return jacobian_vector
+
+
+if numba is not None:
+    cross_entropy_kernel = numba.njit(cache=True, fastmath=True)(cross_entropy_kernel)
+    cross_entropy_jacobi_kernel = numba.njit(cache=True, fastmath=True)(cross_entropy_jacobi_kernel)
+
+
+# Numba specializes on dtype and layout only, so one call on tiny arrays compiles (or loads from cache) the kernels
+# for every model before the worker processes start.
+def warm_up_kernels():
+    if numba is None:
+        return
+    matrix = np.ones((1, 1))
+    vector = np.ones(1)
+    cross_entropy_kernel(matrix, matrix, vector, float(constant_set.eps_for_log), vector)
+    cross_entropy_jacobi_kernel(matrix, matrix, vector, vector)
+
+
 def cross_entropy_obj_func_constructor(substrate_mid_matrix, flux_sum_matrix, target_mid_vector):
+    target_mid_vector = np.ascontiguousarray(target_mid_vector, dtype=np.float64).ravel()
+    if numba is not None:
+        return partial(
+            cross_entropy_kernel, substrate_mid_matrix, flux_sum_matrix, target_mid_vector,
+            float(constant_set.eps_for_log))
+
     def cross_entropy_objective_func(complete_vector):
         # complete_vector = np.hstack([f_vector, constant_flux_array]).reshape([-1, 1])
-        complete_vector = complete_vector.reshape([-1, 1])
-        predicted_mid_vector = (
-                substrate_mid_matrix @ complete_vector / (flux_sum_matrix @ complete_vector) + constant_set.eps_for_log)
-        cross_entropy = -target_mid_vector.reshape([1, -1]) @ np.log(predicted_mid_vector)
+        predicted_mid_vector = substrate_mid_matrix @ complete_vector / (flux_sum_matrix @ complete_vector)
+        cross_entropy = -float(np.dot(target_mid_vector, config.safe_log(
+            predicted_mid_vector, out=predicted_mid_vector)))
         return cross_entropy
 
     return cross_entropy_objective_func
 
 
 def cross_entropy_jacobi_func_constructor(substrate_mid_matrix, flux_sum_matrix, target_mid_vector):
+    if numba is not None:
+        return partial(
+            cross_entropy_jacobi_kernel, substrate_mid_matrix, flux_sum_matrix,
+            np.ascontiguousarray(target_mid_vector, dtype=np.float64).ravel())
+
     def cross_entropy_jacobi_func(complete_vector):
-        complete_vector = complete_vector.reshape([-1, 1])
-        substrate_mid_part = substrate_mid_matrix / (substrate_mid_matrix @ complete_vector)
-        flux_sum_part = flux_sum_matrix / (flux_sum_matrix @ complete_vector)
-        jacobian_vector = target_mid_vector.reshape([1, -1]) @ (flux_sum_part - substrate_mid_part)
-        return jacobian_vector.reshape([-1])
+        substrate_mid_weight = target_mid_vector / (substrate_mid_matrix @ complete_vector)
+        flux_sum_weight = target_mid_vector / (flux_sum_matrix @ complete_vector)
+        jacobian_vector = flux_sum_weight @ flux_sum_matrix - substrate_mid_weight @ substrate_mid_matrix
+        return jacobian_vector
 
     return cross_entropy_jacobi_func
 
 
+def cross_entropy_hessian_func_constructor(substrate_mid_matrix, flux_sum_matrix, target_mid_vector):
+    def cross_entropy_hessian_func(complete_vector):
+        substrate_mid_sum = substrate_mid_matrix @ complete_vector
+        flux_sum = flux_sum_matrix @ complete_vector
+        substrate_mid_weight = target_mid_vector / substrate_mid_sum ** 2
+        flux_sum_weight = target_mid_vector / flux_sum ** 2
+        hessian_matrix = (
+            substrate_mid_matrix.T @ (substrate_mid_weight[:, np.newaxis] * substrate_mid_matrix) -
+            flux_sum_matrix.T @ (flux_sum_weight[:, np.newaxis] * flux_sum_matrix))
+        return hessian_matrix
+
+    return cross_entropy_hessian_func
+
+
 def eq_func_constructor(complete_balance_matrix, complete_balance_vector):
     def eq_func(complete_vector):
-        result = complete_balance_matrix @ complete_vector.reshape([-1, 1]) + complete_balance_vector.reshape([-1, 1])
-        return result.reshape([-1])
+        return complete_balance_matrix @ complete_vector + complete_balance_vector
 
     return eq_func
 
 
-def eq_func_jacob_constructor(complete_balance_matrix, complete_balance_vector):
-    def eq_func_jacob(complete_vector):
-        return complete_balance_matrix
+def constant_jacob(constant_matrix, complete_vector):
+    return constant_matrix
+
+
+_random_generator = None
 
-    return eq_func_jacob
+
+def get_random_generator():
+    global _random_generator
+    if _random_generator is None:
+        _random_generator = np.random.default_rng()
+    return _random_generator
 
 
 def start_point_generator(
-        complete_balance_matrix, complete_balance_vector, bounds, maximal_failed_time=10):
-    a_eq = complete_balance_matrix
+        complete_balance_matrix, complete_balance_vector, bounds, maximal_failed_time=10, rng=None):
+    if rng is None:
+        rng = get_random_generator()
+    if scipy.sparse.issparse(complete_balance_matrix):
+        a_eq = complete_balance_matrix
+    else:
+        a_eq = scipy.sparse.csc_matrix(complete_balance_matrix)
     b_eq = -complete_balance_vector
     raw_lb, raw_ub = bounds
     result = None
     failed_time = 0
     num_variable = a_eq.shape[1]
+    random_obj_matrix = rng.random((maximal_failed_time, num_variable)) - 0.4
+    lp_lb_matrix = raw_lb + rng.random((maximal_failed_time, num_variable)) * 4 + 1
+    lp_ub_matrix = raw_ub * (rng.random((maximal_failed_time, num_variable)) * 0.2 + 0.8)
     while failed_time < maximal_failed_time:
-        random_obj = np.random.random(num_variable) - 0.4
-        lp_lb = raw_lb + np.random.random(num_variable) * 4 + 1
-        lp_ub = raw_ub * (np.random.random(num_variable) * 0.2 + 0.8)
-        bounds_matrix = np.vstack([lp_lb, lp_ub]).T
-        try:
-            res = scipy.optimize.linprog(
-                random_obj, A_eq=a_eq, b_eq=b_eq, bounds=bounds_matrix, method="simplex",
-                options={'tol': 1e-10})  # "disp": True
-        except ValueError:
-            failed_time += 1
-            continue
-        else:
-            if res.success:
-                result = np.array(res.x)
-                break
-            failed_time += 1
+        random_obj = random_obj_matrix[failed_time]
+        bounds_matrix = np.column_stack([lp_lb_matrix[failed_time], lp_ub_matrix[failed_time]])
+        res = scipy.optimize.linprog(
+            random_obj, A_eq=a_eq, b_eq=b_eq, bounds=bounds_matrix, method="highs")  # "disp": True
+        if res.success:
+            result = np.array(res.x)
+            break
+        failed_time += 1
     return result
 
 
-def one_case_solver_slsqp(
-        flux_balance_matrix, flux_balance_constant_vector, substrate_mid_matrix, flux_sum_matrix, target_mid_vector,
-        optimal_obj_value, complete_flux_dict, constant_flux_dict, bounds,
+def slsqp_minimize_option_constructor(
+        substrate_mid_matrix, flux_sum_matrix, target_mid_vector, complete_balance_matrix, complete_balance_vector,
+        sparse_balance_matrix):
+    eq_func = eq_func_constructor(complete_balance_matrix, complete_balance_vector)
+    eq_func_jacob = partial(constant_jacob, complete_balance_matrix)
+    eq_cons = {'type': 'eq', 'fun': eq_func, 'jac': eq_func_jacob}
+    return {
+        'method': 'SLSQP', 'constraints': [eq_cons],
+        'options': {'ftol': 1e-9, 'maxiter': 500}}  # 'disp': True,
+
+
+def trust_constr_minimize_option_constructor(
+        substrate_mid_matrix, flux_sum_matrix, target_mid_vector, complete_balance_matrix, complete_balance_vector,
+        sparse_balance_matrix):
+    cross_entropy_hessian_func = cross_entropy_hessian_func_constructor(
+        substrate_mid_matrix, flux_sum_matrix, target_mid_vector)
+    eq_cons = scipy.optimize.LinearConstraint(
+        sparse_balance_matrix, -complete_balance_vector, -complete_balance_vector)
+    return {
+        'method': 'trust-constr', 'hess': cross_entropy_hessian_func, 'constraints': [eq_cons],
+        'options': {'xtol': 1e-9, 'gtol': 1e-9, 'maxiter': 500}}
+
+
+def one_case_solver_template(
+        minimize_option_constructor, flux_balance_matrix, flux_balance_constant_vector, substrate_mid_matrix,
+        flux_sum_matrix, target_mid_vector, optimal_obj_value, complete_flux_dict, constant_flux_dict, bounds,
         optimization_repeat_time, label=None, fitted=True, **other_parameters):
     constant_flux_matrix, constant_constant_vector = constant_flux_constraint_constructor(
         constant_flux_dict, complete_flux_dict)
-    complete_balance_matrix = np.vstack(
-        [flux_balance_matrix, constant_flux_matrix])
-    complete_balance_vector = np.hstack(
-        [flux_balance_constant_vector, constant_constant_vector])
+    complete_balance_matrix = np.ascontiguousarray(np.vstack(
+        [flux_balance_matrix, constant_flux_matrix]), dtype=np.float64)
+    complete_balance_vector = np.ascontiguousarray(np.hstack(
+        [flux_balance_constant_vector, constant_constant_vector]), dtype=np.float64)
+    substrate_mid_matrix = np.ascontiguousarray(substrate_mid_matrix, dtype=np.float64)
+    flux_sum_matrix = np.ascontiguousarray(flux_sum_matrix, dtype=np.float64)
     cross_entropy_objective_func = cross_entropy_obj_func_constructor(
         substrate_mid_matrix, flux_sum_matrix, target_mid_vector)
     cross_entropy_jacobi_func = cross_entropy_jacobi_func_constructor(
         substrate_mid_matrix, flux_sum_matrix, target_mid_vector)
-    eq_func = eq_func_constructor(complete_balance_matrix, complete_balance_vector)
-    eq_func_jacob = eq_func_jacob_constructor(complete_balance_matrix, complete_balance_vector)
 
-    eq_cons = {'type': 'eq', 'fun': eq_func, 'jac': eq_func_jacob}
     bound_object = scipy.optimize.Bounds(*bounds)
+    sparse_balance_matrix = scipy.sparse.csc_matrix(complete_balance_matrix)
     start_vector = start_point_generator(
-        complete_balance_matrix, complete_balance_vector, bounds)
+        sparse_balance_matrix, complete_balance_vector, bounds)
     # gradient_validation(cross_entropy_objective_func, cross_entropy_jacobi, start_vector)
     if start_vector is None:
         result_dict = {}
@@ -225,47 +341,53 @@ def one_case_solver_slsqp(
         success = False
     else:
         if not fitted:
-            obj_value = cross_entropy_objective_func(start_vector)[0][0]
+            obj_value = cross_entropy_objective_func(start_vector)
             success = True
             result_dict = {
                 flux_name: flux_value for flux_name, flux_value
                 in zip(complete_flux_dict.keys(), start_vector)}
         else:
-            result_dict = {}
+            minimize_option_dict = minimize_option_constructor(
+                substrate_mid_matrix, flux_sum_matrix, target_mid_vector, complete_balance_matrix,
+                complete_balance_vector, sparse_balance_matrix)
+            best_vector = None
             success = False
             obj_value = 999999
             for _ in range(optimization_repeat_time):
                 start_vector = start_point_generator(
-                    complete_balance_matrix, complete_balance_vector, bounds)
+                    sparse_balance_matrix, complete_balance_vector, bounds)
                 if start_vector is None:
                     continue
                 current_result = scipy.optimize.minimize(
-                    cross_entropy_objective_func, start_vector, method='SLSQP', jac=cross_entropy_jacobi_func,
-                    constraints=[eq_cons], options={'ftol': 1e-9, 'maxiter': 500}, bounds=bound_object)  # 'disp': True,
+                    cross_entropy_objective_func, start_vector, jac=cross_entropy_jacobi_func,
+                    bounds=bound_object, **minimize_option_dict)
                 if current_result.success and current_result.fun < obj_value:
-                    result_dict = {
-                        flux_name: flux_value for flux_name, flux_value
-                        in zip(complete_flux_dict.keys(), current_result.x)}
-                    obj_value = current_result.fun
+                    best_vector = current_result.x
+                    obj_value = float(current_result.fun)
                     success = current_result.success
+            if best_vector is None:
+                result_dict = {}
+            else:
+                result_dict = dict(zip(complete_flux_dict.keys(), best_vector))
     return config.Result(result_dict, obj_value, success, optimal_obj_value, label)
 
 
+def one_case_solver_slsqp(*args, **kwargs):
+    return one_case_solver_template(slsqp_minimize_option_constructor, *args, **kwargs)
+
+
+def one_case_solver_trust_constr(*args, **kwargs):
+    return one_case_solver_template(trust_constr_minimize_option_constructor, *args, **kwargs)
+
+
 def calculate_one_tissue_tca_contribution(input_net_flux_list):
-    real_flux_list = []
-    total_input_flux = 0
-    total_output_flux = 0
-    for net_flux in input_net_flux_list:
-        if net_flux > 0:
-            total_input_flux += net_flux
-        else:
-            total_output_flux -= net_flux
-    for net_flux in input_net_flux_list:
-        current_real_flux = 0
-        if net_flux > 0:
-            current_real_flux = net_flux - net_flux / total_input_flux * total_output_flux
-        real_flux_list.append(current_real_flux)
-    real_flux_array = np.array(real_flux_list)
+    net_flux_array = np.asarray(input_net_flux_list, dtype=np.float64)
+    input_flux_array = np.maximum(net_flux_array, 0)
+    total_input_flux = input_flux_array.sum()
+    if total_input_flux == 0:
+        return np.zeros_like(input_flux_array)
+    total_output_flux = -np.minimum(net_flux_array, 0).sum()
+    real_flux_array = input_flux_array - input_flux_array * (total_output_flux / total_input_flux)
     return real_flux_array
 
 
@@ -294,7 +416,7 @@ def evaluation_for_one_flux(result_dict, constant_dict, mid_constraint_list, mid
     return predicted_mid_dict
 
 
-def plot_raw_mid_bar(data_dict, color_dict=None, error_bar_dict=None, title=None, save_path=None):
+def plot_raw_mid_bar(data_dict, color_dict=None, error_bar_dict=None, title=None, save_path=None, ax=None):
     edge = 0.2
     bar_total_width = 0.7
     group_num = len(data_dict)
@@ -306,7 +428,12 @@ def plot_raw_mid_bar(data_dict, color_dict=None, error_bar_dict=None, title=None
         elif len(np_array) != array_len:
             raise ValueError("Length of array not equal: {}".format(data_name))
     fig_size = (array_len + edge * 2, 4)
-    fig, ax = plt.subplots(figsize=fig_size)
+    if ax is None:
+        fig, ax = plt.subplots(figsize=fig_size)
+    else:
+        fig = ax.figure
+        ax.clear()
+        fig.set_size_inches(fig_size)
     x_mid_loc = np.arange(array_len) + 0.5
     x_left_loc = x_mid_loc - bar_total_width / 2
     for index, (data_name, mid_array) in enumerate(data_dict.items()):
@@ -339,7 +466,7 @@ def plot_raw_mid_bar(data_dict, color_dict=None, error_bar_dict=None, title=None
     if title:
         ax.set_title(title)
     if save_path:
-        fig.savefig(save_path, dpi=fig.dpi)
+        fig.savefig(save_path)
 
 
 # data_matrix: show the location of heatmap
@@ -347,8 +474,8 @@ def plot_heat_map(
         data_matrix, x_free_variable, y_free_variable, cmap=None, cbar_name=None, title=None, save_path=None):
     fig, ax = plt.subplots()
     im = ax.imshow(data_matrix, cmap=cmap)
-    ax.set_xlim([0, x_free_variable.total_num])
-    ax.set_ylim([0, y_free_variable.total_num])
+    ax.set_xlim([0, x_free_variable.n_points])
+    ax.set_ylim([0, y_free_variable.n_points])
     ax.set_xticks(x_free_variable.tick_in_range)
     ax.set_yticks(y_free_variable.tick_in_range)
     ax.set_xticklabels(x_free_variable.tick_labels)
@@ -437,6 +564,8 @@ def plot_box_distribution(data_dict, save_path=None, title=None, broken_yaxis=No
 # Plot a scatter in triangle based on data_matrix
 # data_matrix: N-3 matrix. Each row is a point with 3 coordinate
 def plot_ternary_scatter(data_matrix):
+    import ternary
+
     ### Scatter Plot
     scale = 1
     figure, tax = ternary.figure(scale=scale)
@@ -457,10 +586,13 @@ def plot_ternary_scatter(data_matrix):
 # Order of ternary cor: x1: bottom (to right) x2: right (to left) x3: left (to bottom)
 def plot_ternary_density(
         tri_data_matrix, sigma: float = 1, bin_num: int = 2 ** 8, mean=False, title=None, save_path=None):
+    import ternary
+    from ternary.helpers import simplex_iterator
+
     sqrt_3 = np.sqrt(3)
 
-    def standard_2dnormal(x, y, _sigma):
-        return np.exp(-0.5 / _sigma ** 2 * (x ** 2 + y ** 2)) / (2 * np.pi * _sigma ** 2)
+    def standard_normal(x, _sigma):
+        return np.exp(-0.5 / _sigma ** 2 * x ** 2) / (np.sqrt(2 * np.pi) * _sigma)
 
     # Each row is the cartesian cor.
     def tri_to_car(input_data_matrix):
@@ -474,23 +606,29 @@ def plot_ternary_density(
         x1_value = input_data_matrix[:, 0] - y_value / sqrt_3
         return np.vstack([x1_value, x2_value]).T
 
+    # The 2-D Gaussian kernel is separable, so it is applied as the same 1-D kernel along both axes.
     def gaussian_kernel_generator(_bin_num, _sigma):
         x = np.linspace(0, 1, _bin_num) - 0.5
-        y = np.linspace(0, 1, _bin_num) - 0.5
-        X, Y = np.meshgrid(x, y)
-        gaussian_kernel = standard_2dnormal(X, Y, _sigma)
-        return np.rot90(gaussian_kernel)
+        return standard_normal(x, _sigma)
+
+    def gaussian_blur(_data_matrix, _gaussian_kernel):
+        kernel_size = len(_gaussian_kernel)
+        # Same alignment as scipy.signal.convolve2d(..., mode='same') for even kernel sizes.
+        origin = (kernel_size - 1) // 2 - kernel_size // 2
+        blurred_matrix = scipy.ndimage.convolve1d(
+            _data_matrix, _gaussian_kernel, axis=0, mode='constant', origin=origin)
+        return scipy.ndimage.convolve1d(blurred_matrix, _gaussian_kernel, axis=1, mode='constant', origin=origin)
 
     def bin_car_data_points(_car_data_matrix, _bin_num):
         histogram, _, _ = np.histogram2d(
             _car_data_matrix[:, 0], _car_data_matrix[:, 1], bins=np.linspace(0, 1, _bin_num + 1))
         return histogram
 
-    def complete_tri_set_interpolation(_location_list, _value_list, _scale):
+    def complete_tri_set_interpolation(_location_array, _value_array, _scale):
         result_tri_array = np.array(list(simplex_iterator(_scale))) / _scale
         result_car_array = tri_to_car(result_tri_array)
         result_value_array = scipy.interpolate.griddata(
-            np.array(_location_list), np.array(_value_list), result_car_array, method='cubic')
+            _location_array, _value_array, result_car_array, method='cubic')
         target_dict = {}
         for (i, j, k), result_value in zip(simplex_iterator(bin_num), result_value_array):
             target_dict[(i, j)] = result_value
@@ -498,16 +636,13 @@ def plot_ternary_density(
 
     car_data_matrix = tri_to_car(tri_data_matrix)
     data_bin_matrix = bin_car_data_points(car_data_matrix, bin_num)
-    gaussian_kernel_matrix = gaussian_kernel_generator(bin_num, sigma)
-    car_blurred_matrix = scipy.signal.convolve2d(data_bin_matrix, gaussian_kernel_matrix, mode='same')
+    gaussian_kernel = gaussian_kernel_generator(bin_num, sigma)
+    car_blurred_matrix = gaussian_blur(data_bin_matrix, gaussian_kernel)
     x_axis = y_axis = np.linspace(0, 1, bin_num)
-    location_list = []
-    value_list = []
-    for x_index, x_value in enumerate(x_axis):
-        for y_index, y_value in enumerate(y_axis):
-            location_list.append([x_value, y_value])
-            value_list.append(car_blurred_matrix[x_index, y_index])
-    complete_density_dict = complete_tri_set_interpolation(location_list, value_list, bin_num)
+    x_matrix, y_matrix = np.meshgrid(x_axis, y_axis, indexing='ij')
+    location_array = np.stack([x_matrix.ravel(), y_matrix.ravel()], axis=1)
+    value_array = car_blurred_matrix.ravel()
+    complete_density_dict = complete_tri_set_interpolation(location_array, value_array, bin_num)
     fig, tax = ternary.figure(scale=bin_num)
     tax.heatmap(complete_density_dict, cmap='Blues', style="h")
     tax.boundary(linewidth=1.0)
@@ -534,25 +669,85 @@ def parallel_solver_single(
     return result, hook_result
 
 
+_worker_parameter_dict = {}
+
+
+_worker_progress_counter = None
+
+
+def parallel_solver_worker_initializer(
+        const_parameter_dict, one_case_solver_func, hook_in_each_iteration, progress_counter):
+    global _random_generator, _worker_progress_counter
+    _random_generator = np.random.default_rng(os.getpid())
+    _worker_progress_counter = progress_counter
+    _worker_parameter_dict['const_parameter_dict'] = const_parameter_dict
+    _worker_parameter_dict['one_case_solver_func'] = one_case_solver_func
+    _worker_parameter_dict['hook_in_each_iteration'] = hook_in_each_iteration
+
+
+def parallel_solver_worker(var_parameter_dict):
+    raw_result = parallel_solver_single(var_parameter_dict, **_worker_parameter_dict)
+    with _worker_progress_counter.get_lock():
+        _worker_progress_counter.value += 1
+    return raw_result
+
+
+# imap hands back results a whole chunk at a time, so the progress bar follows a counter shared with the workers
+# instead.
+def progress_bar_monitor(progress_counter, progress_bar, stop_event, interval=0.5):
+    shown_num = 0
+    while True:
+        stopped = stop_event.wait(interval)
+        finished_num = progress_counter.value
+        progress_bar.update(finished_num - shown_num)
+        shown_num = finished_num
+        if stopped:
+            break
+
+
+# With --resume, results of finished cases are recorded in an SQLite file while the pool runs, so that an interrupted
+# run can be picked up again. Cases are identified by a hash of their pickled var_parameter_dict; the fingerprint of
+# the constant parameters, data and solver is stored alongside, and a mismatch discards the recorded cases.
+def case_cache_connect(model_name, fingerprint):
+    cache_path = "{}/{}_case_cache.sqlite".format(constant_set.output_direct, model_name)
+    connection = sqlite3.connect(cache_path)
+    connection.execute("CREATE TABLE IF NOT EXISTS case_result (case_key TEXT PRIMARY KEY, raw_result BLOB)")
+    connection.execute("CREATE TABLE IF NOT EXISTS cache_info (fingerprint TEXT)")
+    stored_fingerprint = connection.execute("SELECT fingerprint FROM cache_info").fetchone()
+    if stored_fingerprint is None or stored_fingerprint[0] != fingerprint:
+        connection.execute("DELETE FROM case_result")
+        connection.execute("DELETE FROM cache_info")
+        connection.execute("INSERT INTO cache_info VALUES (?)", (fingerprint,))
+        connection.commit()
+    return connection
+
+
+def case_cache_load(connection, case_key_list):
+    case_key_set = set(case_key_list)
+    return {
+        case_key: pickle.loads(raw_result) for case_key, raw_result
+        in connection.execute("SELECT case_key, raw_result FROM case_result") if case_key in case_key_set}
+
+
 def parallel_solver(
         data_loader_func, parameter_construction_func,
         one_case_solver_func, hook_in_each_iteration, model_name,
-        hook_after_all_iterations, parallel_num, **other_parameters):
+        hook_after_all_iterations, parallel_num, chunk_size=None, resume=False, **other_parameters):
     # manager = multiprocessing.Manager()
     # q = manager.Queue()
     # result = pool.map_async(task, [(x, q) for x in range(10)])
     debug = False
 
     if parallel_num is None:
-        cpu_count = os.cpu_count()
+        cpu_count = None
+        if psutil is not None:
+            cpu_count = psutil.cpu_count(logical=False)
+        if cpu_count is None:
+            cpu_count = os.cpu_count()
         if cpu_count < 10:
-            parallel_num = cpu_count - 1
+            parallel_num = max(cpu_count - 1, 1)
         else:
             parallel_num = min(cpu_count, 16)
-    if parallel_num < 8:
-        chunk_size = 40
-    else:
-        chunk_size = 80
 
     model_mid_data_dict = data_loader_func(**other_parameters)
     const_parameter_dict, var_parameter_list = parameter_construction_func(
@@ -565,6 +760,9 @@ def parallel_solver(
     else:
         var_parameter_list2 = var_parameter_list
         total_length = len(var_parameter_list)
+    if chunk_size is None:
+        # About four chunks per worker: few enough dispatches, while still balancing uneven cases.
+        chunk_size = max(1, total_length // (4 * parallel_num))
 
     if debug:
         result_list = []
@@ -575,16 +773,57 @@ def parallel_solver(
             result_list.append(result)
             hook_result_list.append(hook_result)
     else:
-        with mp.Pool(processes=parallel_num) as pool:
+        if not os.path.isdir(constant_set.output_direct):
+            os.mkdir(constant_set.output_direct)
+        var_parameter_list = list(var_parameter_list)
+        raw_result_list = [None] * len(var_parameter_list)
+        pending_index_list = list(range(len(var_parameter_list)))
+        case_cache = None
+        if resume and not const_parameter_dict.get('resumable', True):
+            print("Cases of {} are sampled randomly in each run and cannot be resumed.".format(model_name))
+        elif resume:
+            fingerprint = hashlib.sha256(pickle.dumps((
+                other_parameters.get('test', False), one_case_solver_func.__name__,
+                {key: value for key, value in const_parameter_dict.items() if key != 'parallel_num'}))).hexdigest()
+            case_key_list = [
+                hashlib.sha256(pickle.dumps(var_parameter_dict)).hexdigest()
+                for var_parameter_dict in var_parameter_list]
+            case_cache = case_cache_connect(model_name, fingerprint)
+            cached_result_dict = case_cache_load(case_cache, case_key_list)
+            pending_index_list = []
+            for index, case_key in enumerate(case_key_list):
+                if case_key in cached_result_dict:
+                    raw_result_list[index] = cached_result_dict[case_key]
+                else:
+                    pending_index_list.append(index)
+        progress_counter = mp.Value('i', 0)
+        progress_bar = tqdm.tqdm(
+            total=total_length, initial=total_length - len(pending_index_list), smoothing=0, maxinterval=5,
+            desc="Computation progress of {}".format(model_name))
+        stop_event = threading.Event()
+        monitor_thread = threading.Thread(
+            target=progress_bar_monitor, args=(progress_counter, progress_bar, stop_event), daemon=True)
+        monitor_thread.start()
+        with mp.Pool(
+                processes=parallel_num, initializer=parallel_solver_worker_initializer,
+                initargs=(const_parameter_dict, one_case_solver_func, hook_in_each_iteration,
+                          progress_counter)) as pool:
             raw_result_iter = pool.imap(
-                partial(
-                    parallel_solver_single, const_parameter_dict=const_parameter_dict,
-                    one_case_solver_func=one_case_solver_func,
-                    hook_in_each_iteration=hook_in_each_iteration),
-                var_parameter_list, chunk_size)
-            raw_result_list = list(tqdm.tqdm(
-                raw_result_iter, total=total_length, smoothing=0, maxinterval=5,
-                desc="Computation progress of {}".format(model_name)))
+                parallel_solver_worker, (var_parameter_list[index] for index in pending_index_list), chunk_size)
+            for finished_num, (raw_result, index) in enumerate(zip(raw_result_iter, pending_index_list)):
+                raw_result_list[index] = raw_result
+                if case_cache is not None:
+                    case_cache.execute(
+                        "INSERT OR REPLACE INTO case_result VALUES (?, ?)",
+                        (case_key_list[index], pickle.dumps(raw_result)))
+                    if (finished_num + 1) % chunk_size == 0:
+                        case_cache.commit()
+        stop_event.set()
+        monitor_thread.join()
+        progress_bar.close()
+        if case_cache is not None:
+            case_cache.commit()
+            case_cache.close()
 
         result_iter, hook_result_iter = zip(*raw_result_list)
         result_list = list(result_iter)
@@ -604,7 +843,7 @@ def parallel_solver(
 #     self.success = success
 #     self.minimal_obj_value = minimal_obj_value
 def fitting_result_display(
-        data_loader_func, model_name, model_construction_func, obj_tolerance,
+        data_loader_func, model_name, model_construction_func, obj_tolerance, complete_flux_dict,
         **other_parameters):
     server_data = False
     total_output_direct = constant_set.output_direct
@@ -616,12 +855,12 @@ def fitting_result_display(
     plot_color_dict = {experimental_label: color_set.blue, predicted_label: color_set.orange}
 
     target_vector_dict = {}
-    mid_size_dict = {}
+    mid_size_list = []
     for mid_constraint_dict in mid_constraint_list:
         target_vector = mid_constraint_dict[constant_set.target_label]
         name = "_".join([name for name in mid_constraint_dict.keys() if name != 'target'])
         target_vector_dict[name] = target_vector
-        mid_size_dict[name] = len(target_vector)
+        mid_size_list.append((name, len(target_vector)))
 
     if server_data:
         output_direct = "{}/{}_server".format(total_output_direct, model_name)
@@ -631,28 +870,30 @@ def fitting_result_display(
     with gzip.open(raw_data_dict_gz_file, 'rb') as f_in:
         raw_input_data_dict = pickle.load(f_in)
     result_list: list = raw_input_data_dict['result_list']
-    predicted_mid_collection_dict = {}
-    for result_object in result_list:
-        if result_object.success:
-            obj_diff = result_object.obj_value - result_object.minimal_obj_value
-            if obj_diff < obj_tolerance:
-                predicted_mid_dict = evaluation_for_one_flux(
-                    result_object.result_dict, {}, mid_constraint_list, mid_size_dict)
-                for mid_name, mid_vector in predicted_mid_dict.items():
-                    if mid_name not in predicted_mid_collection_dict:
-                        predicted_mid_collection_dict[mid_name] = []
-                    predicted_mid_collection_dict[mid_name].append(mid_vector)
-    for mid_name, mid_vector_list in predicted_mid_collection_dict.items():
-        predicted_mid_mean = np.mean(mid_vector_list, axis=0)
-        predicted_mid_std = np.std(mid_vector_list, axis=0)
+    well_fitted_result_list = [
+        result_object for result_object in result_list if result_object.success and
+        result_object.obj_value - result_object.minimal_obj_value < obj_tolerance]
+    if not well_fitted_result_list:
+        return
+    flux_value_dict = config.Result.stack(well_fitted_result_list)
+    flux_value_matrix = np.column_stack([flux_value_dict[flux_name] for flux_name in complete_flux_dict])
+    substrate_mid_matrix, flux_sum_matrix, _, _ = mid_constraint_constructor(mid_constraint_list, complete_flux_dict)
+    predicted_mid_matrix = (flux_value_matrix @ substrate_mid_matrix.T) / (flux_value_matrix @ flux_sum_matrix.T)
+    fig, ax = plt.subplots()
+    row_start = 0
+    for mid_name, mid_size in mid_size_list:
+        mid_vector_matrix = predicted_mid_matrix[:, row_start:row_start + mid_size]
+        row_start += mid_size
+        predicted_mid_mean = np.mean(mid_vector_matrix, axis=0)
+        predicted_mid_std = np.std(mid_vector_matrix, axis=0)
         target_mid_vector = target_vector_dict[mid_name]
         plot_data_dict = {experimental_label: target_mid_vector, predicted_label: predicted_mid_mean}
         plot_errorbar_dict = {predicted_label: predicted_mid_std}
         save_path = "{}/complete_mid_prediction_distribution_{}.png".format(output_direct, mid_name)
         plot_raw_mid_bar(
             plot_data_dict, color_dict=plot_color_dict, error_bar_dict=plot_errorbar_dict,
-            title=mid_name, save_path=save_path)
-    plt.show()
+            title=mid_name, save_path=save_path, ax=ax)
+    plt.close(fig)
 
 
 def result_processing_each_iteration_template(result: config.Result, contribution_func):
@@ -668,51 +909,56 @@ def result_processing_each_iteration_template(result: config.Result, contributio
     return processed_dict
 
 
+_PARAMETER_DICT = {
+    'model1': 'model1_parameters',
+    'model1_m5': 'model1_m5_parameters',
+    'model1_m9': 'model1_m9_parameters',
+    'model1_lactate': 'model1_lactate_parameters',
+    'model1_lactate_m4': 'model1_lactate_m4_parameters',
+    'model1_lactate_m10': 'model1_lactate_m10_parameters',
+    'model1_lactate_m11': 'model1_lactate_m11_parameters',
+    'model1_all': 'model1_all_tissue',
+    'model1_all_m5': 'model1_all_tissue_m5',
+    'model1_all_m9': 'model1_all_tissue_m9',
+    'model1_all_lactate': 'model1_all_tissue_lactate',
+    'model1_all_lactate_m4': 'model1_all_tissue_lactate_m4',
+    'model1_all_lactate_m10': 'model1_all_tissue_lactate_m10',
+    'model1_all_lactate_m11': 'model1_all_tissue_lactate_m11',
+    'model1_all_hypoxia': 'model1_hypoxia_correction',
+    'model1_unfitted': 'model1_unfitted_parameters',
+    'parameter': 'model1_parameter_sensitivity',
+    'model3': 'model3_parameters',
+    'model3_all': 'model3_all_tissue',
+    'model3_all_m5': 'model3_all_tissue_m5',
+    'model3_all_m9': 'model3_all_tissue_m9',
+    'model3_all_lactate': 'model3_all_tissue_lactate',
+    'model3_all_lactate_m4': 'model3_all_tissue_lactate_m4',
+    'model3_all_lactate_m10': 'model3_all_tissue_lactate_m10',
+    'model3_all_lactate_m11': 'model3_all_tissue_lactate_m11',
+    'model3_unfitted': 'model3_unfitted_parameters',
+    'model5': 'model5_parameters',
+    'model5_comb2': 'model5_comb2_parameters',
+    'model5_comb3': 'model5_comb3_parameters',
+    'model5_unfitted': 'model5_unfitted_parameters',
+    'model6': 'model6_parameters',
+    'model6_m2': 'model6_m2_parameters',
+    'model6_m3': 'model6_m3_parameters',
+    'model6_m4': 'model6_m4_parameters',
+    'model6_unfitted': 'model6_unfitted_parameters',
+    'model7': 'model7_parameters',
+    'model7_m2': 'model7_m2_parameters',
+    'model7_m3': 'model7_m3_parameters',
+    'model7_m4': 'model7_m4_parameters',
+    'model7_unfitted': 'model7_unfitted_parameters'}
+_SOLVER_DICT = {
+    'slsqp': one_case_solver_slsqp,
+    'trust_constr': one_case_solver_trust_constr}
+
+
 def parser_main():
-    parameter_dict = {
-        'model1': model_parameter_functions.model1_parameters,
-        'model1_m5': model_parameter_functions.model1_m5_parameters,
-        'model1_m9': model_parameter_functions.model1_m9_parameters,
-        'model1_lactate': model_parameter_functions.model1_lactate_parameters,
-        'model1_lactate_m4': model_parameter_functions.model1_lactate_m4_parameters,
-        'model1_lactate_m10': model_parameter_functions.model1_lactate_m10_parameters,
-        'model1_lactate_m11': model_parameter_functions.model1_lactate_m11_parameters,
-        'model1_all': model_parameter_functions.model1_all_tissue,
-        'model1_all_m5': model_parameter_functions.model1_all_tissue_m5,
-        'model1_all_m9': model_parameter_functions.model1_all_tissue_m9,
-        'model1_all_lactate': model_parameter_functions.model1_all_tissue_lactate,
-        'model1_all_lactate_m4': model_parameter_functions.model1_all_tissue_lactate_m4,
-        'model1_all_lactate_m10': model_parameter_functions.model1_all_tissue_lactate_m10,
-        'model1_all_lactate_m11': model_parameter_functions.model1_all_tissue_lactate_m11,
-        'model1_all_hypoxia': model_parameter_functions.model1_hypoxia_correction,
-        'model1_unfitted': model_parameter_functions.model1_unfitted_parameters,
-        'parameter': model_parameter_functions.model1_parameter_sensitivity,
-        'model3': model_parameter_functions.model3_parameters,
-        'model3_all': model_parameter_functions.model3_all_tissue,
-        'model3_all_m5': model_parameter_functions.model3_all_tissue_m5,
-        'model3_all_m9': model_parameter_functions.model3_all_tissue_m9,
-        'model3_all_lactate': model_parameter_functions.model3_all_tissue_lactate,
-        'model3_all_lactate_m4': model_parameter_functions.model3_all_tissue_lactate_m4,
-        'model3_all_lactate_m10': model_parameter_functions.model3_all_tissue_lactate_m10,
-        'model3_all_lactate_m11': model_parameter_functions.model3_all_tissue_lactate_m11,
-        'model3_unfitted': model_parameter_functions.model3_unfitted_parameters,
-        'model5': model_parameter_functions.model5_parameters,
-        'model5_comb2': model_parameter_functions.model5_comb2_parameters,
-        'model5_comb3': model_parameter_functions.model5_comb3_parameters,
-        'model5_unfitted': model_parameter_functions.model5_unfitted_parameters,
-        'model6': model_parameter_functions.model6_parameters,
-        'model6_m2': model_parameter_functions.model6_m2_parameters,
-        'model6_m3': model_parameter_functions.model6_m3_parameters,
-        'model6_m4': model_parameter_functions.model6_m4_parameters,
-        'model6_unfitted': model_parameter_functions.model6_unfitted_parameters,
-        'model7': model_parameter_functions.model7_parameters,
-        'model7_m2': model_parameter_functions.model7_m2_parameters,
-        'model7_m3': model_parameter_functions.model7_m3_parameters,
-        'model7_m4': model_parameter_functions.model7_m3_parameters,
-        'model7_unfitted': model_parameter_functions.model7_unfitted_parameters}
     parser = argparse.ArgumentParser(description='MFA for multi-tissue model by Shiyu Liu.')
     parser.add_argument(
-        'model_name', choices=parameter_dict.keys(), help='The name of model you want to compute.')
+        'model_name', choices=_PARAMETER_DICT.keys(), help='The name of model you want to compute.')
     parser.add_argument(
         '-t', '--test_mode', action='store_true', default=False,
         help='Whether the code is executed in test mode, which means less sample number and shorter time.')
@@ -722,11 +968,22 @@ def parser_main():
     parser.add_argument(
         '-p', '--parallel_num', type=int, default=None,
         help='Number of parallel processes. If not provided, it will be selected according to CPU cores.')
+    parser.add_argument(
+        '-s', '--solver', choices=_SOLVER_DICT.keys(), default='slsqp',
+        help='Optimizer used for each case. Default is slsqp.')
+    parser.add_argument(
+        '-r', '--resume', action='store_true', default=False,
+        help='Whether to record finished cases and reuse those left by an interrupted run of the same model.')
 
     args = parser.parse_args()
-    current_model_parameter_dict = parameter_dict[args.model_name](args.test_mode)
+    # Figures are only saved to files from the command line.
+    plt.switch_backend('Agg')
+    current_model_parameter_func = getattr(model_parameter_functions, _PARAMETER_DICT[args.model_name])
+    current_model_parameter_dict = current_model_parameter_func(args.test_mode)
+    warm_up_kernels()
     parallel_solver(
-        **current_model_parameter_dict, parallel_num=args.parallel_num, one_case_solver_func=one_case_solver_slsqp)
+        **current_model_parameter_dict, parallel_num=args.parallel_num,
+        one_case_solver_func=_SOLVER_DICT[args.solver], resume=args.resume)
     if args.fitting_result:
         fitting_result_display(**current_model_parameter_dict)
 